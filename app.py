@@ -1,9 +1,13 @@
-from flask import Flask, redirect, render_template, flash, session, g
+from flask import Flask, redirect, render_template, flash, session, g, make_response, request
 from flask_debugtoolbar import DebugToolbarExtension
-from sqlalchemy import exc
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.profiler import ProfilerMiddleware
+from sqlalchemy import and_, exc, or_
+from sqlalchemy.orm import load_only
 from forms import UserAddForm, UserLoginForm, EditUserForm, UserFavoritesForm
-from handlers import handle_game_choices, handle_signup_errors, random_user
+from handlers import cache, get_user_with_favorites, handle_game_choices, handle_signup_errors, random_user
 from models import Match, connect_db, db, User, Favorites, AcceptedMatches
+import os
 
 CURR_USER_KEY = "curr_user"
 
@@ -11,14 +15,23 @@ app = Flask(__name__)
 
 if app.config["ENV"] == "production":
     app.config.from_object('config.ProductionConfig')
+    # Share compiled templates between workers instead of compiling them in each one
+    app.jinja_options = dict(app.jinja_options, auto_reload=False, bytecode_cache=FileSystemBytecodeCache())
 elif app.config["ENV"] == "testing":
     app.config.from_object('config.TestingConfig')
 else:
     app.config.from_object('config.DevelopmentConfig')
-    
-toolbar = DebugToolbarExtension(app)
+
+    # Write a cProfile file for every request to profiles/
+    if os.environ.get('FLASK_PROFILE') == '1':
+        os.makedirs('profiles', exist_ok=True)
+        app.wsgi_app = ProfilerMiddleware(app.wsgi_app, stream=None, profile_dir='profiles')
+
+if app.debug:
+    toolbar = DebugToolbarExtension(app)
 
 connect_db(app)
+cache.init_app(app)
 
 ########################################################
 # User Signup/Login/Logout Routes:
@@ -28,7 +41,10 @@ def add_user_to_g():
     """If logged in, add current user to Flask global."""
 
     if CURR_USER_KEY in session:
-        g.user = User.query.get(session[CURR_USER_KEY])
+        # Only load the columns used on every page, routes needing the full user query for it
+        g.user = User.query.options(
+            load_only(User.id, User.username, User.image_url, User.favorites_id)
+        ).get(session[CURR_USER_KEY])
 
     else:
         g.user = None
@@ -46,6 +62,17 @@ def do_logout():
     if CURR_USER_KEY in session:
         del session[CURR_USER_KEY]
 
+
+def conditional_response(html):
+    """Tag a rendered page with an ETag so browsers revalidate it and get a 304 if unchanged."""
+
+    resp = make_response(html)
+    resp.add_etag()
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+
+    return resp.make_conditional(request)
+
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     """Handle user signup"""
@@ -72,8 +99,8 @@ def signup():
 
             return redirect('/login')
         # If db errors, redirect back to try again
-        except exc.SQLAlchemyError as e:
-            print(f'ERROR TYPE: {type(e)}')
+        except exc.SQLAlchemyError:
+            app.logger.exception('Error signing up user')
             flash('Something went wrong. Please try again.', 'danger')
             return redirect('/signup')
     else:
@@ -124,9 +151,10 @@ def show_favorites_form():
     form = UserFavoritesForm()
 
     # Handle Favorite Game Choices
-    form.game1.choices = handle_game_choices()
-    form.game2.choices = handle_game_choices()
-    form.game3.choices = handle_game_choices()
+    games = handle_game_choices()
+    form.game1.choices = games
+    form.game2.choices = games
+    form.game3.choices = games
 
     return render_template('users/set_favorites.html', form=form)
 
@@ -147,15 +175,15 @@ def set_user_favorites():
             user_id=g.user.id
         )
         db.session.add(favorites)
-        db.session.commit()
+        db.session.flush()
 
         g.user.favorites_id = favorites.id
         db.session.commit()
 
         flash("Your favorites have been saved! Edit them at anytime from your profile.", "success")
         return redirect('/')
-    except exc.SQLAlchemyError as e:
-        print(f'ERROR TYPE: {type(e)}')
+    except exc.SQLAlchemyError:
+        app.logger.exception('Error saving user favorites')
         flash('Something went wrong. Please try again.', 'danger')
         return redirect('/favorites')
 
@@ -169,15 +197,10 @@ def show_user_profile(user_id):
     if not g.user:
         return redirect("/")
 
-    user = User.query.get_or_404(user_id)
-    favorites = Favorites.query.filter_by(user_id=user.id).one_or_none()
-    matches = user.all_matches()
-    match_ids = []
+    user, favorites = get_user_with_favorites(user_id)
+    match_ids = user.all_match_ids()
 
-    for u in matches:
-        match_ids.append(u.id)
-
-    return render_template('users/detail.html', user=user, favorites=favorites, matches=matches, match_ids=match_ids)
+    return conditional_response(render_template('users/detail.html', user=user, favorites=favorites, match_ids=match_ids))
 
 @app.route('/users/<int:user_id>/edit')
 def show_edit_profile_form(user_id):
@@ -187,8 +210,7 @@ def show_edit_profile_form(user_id):
         flash("Access unauthorized.", "danger")
         return redirect("/")
 
-    user = User.query.get_or_404(user_id)
-    favorites = Favorites.query.filter_by(user_id=user.id).one_or_none()
+    user, favorites = get_user_with_favorites(user_id)
 
     form = EditUserForm()
 
@@ -208,9 +230,10 @@ def show_edit_profile_form(user_id):
         form.game3.data = favorites.game3
 
     # Handle Favorite Game Choices
-    form.game1.choices = handle_game_choices()
-    form.game2.choices = handle_game_choices()
-    form.game3.choices = handle_game_choices()
+    games = handle_game_choices()
+    form.game1.choices = games
+    form.game2.choices = games
+    form.game3.choices = games
 
     return render_template('users/edit.html', form=form, user=user)
 
@@ -222,8 +245,7 @@ def edit_user_profile(user_id):
         flash("Access unauthorized.", "danger")
         return redirect("/")
 
-    user = User.query.get_or_404(user_id)
-    favorites = Favorites.query.filter_by(user_id=user.id).one_or_none()
+    user, favorites = get_user_with_favorites(user_id)
 
     form = EditUserForm()
 
@@ -233,13 +255,13 @@ def edit_user_profile(user_id):
 
     if User.authenticate(user.username,form.password.data):
         # Update user account information
-        user.username = form.username.data,
-        user.email = form.email.data,
-        user.first_name = form.first_name.data,
-        user.last_name = form.last_name.data,
-        user.bio = form.bio.data,
-        user.discord_username = form.discord_username.data,
-        user.image_url = form.image_url.data or User.image_url.default.arg,
+        user.username = form.username.data
+        user.email = form.email.data
+        user.first_name = form.first_name.data
+        user.last_name = form.last_name.data
+        user.bio = form.bio.data
+        user.discord_username = form.discord_username.data
+        user.image_url = form.image_url.data or User.image_url.default.arg
                 
         # If user hasn't set up their favorites yet, create a new Favorites Instance for the user
         if not favorites:
@@ -252,16 +274,16 @@ def edit_user_profile(user_id):
                 user_id=user.id
             )
             db.session.add(new_favorites)
-            db.session.commit()
+            db.session.flush()
             user.favorites_id = new_favorites.id
 
         else:
             # Update user favorites
-            favorites.role = form.role.data,
-            favorites.system = form.system.data,
-            favorites.game1 = form.game1.data,
-            favorites.game2 = form.game2.data,
-            favorites.game3 = form.game3.data,
+            favorites.role = form.role.data
+            favorites.system = form.system.data
+            favorites.game1 = form.game1.data
+            favorites.game2 = form.game2.data
+            favorites.game3 = form.game3.data
 
         db.session.commit()
         return redirect(f"/users/{user.id}")
@@ -295,18 +317,8 @@ def show_homepage():
     if not g.user:
         return render_template('home-anon.html')
 
-    # Pick a random, not matched, user to offer as a match
-    other_user = random_user()[0]
-
-    # Check if the random user is already matched with logged in user
-    already_matched = AcceptedMatches.query.filter(g.user.id == AcceptedMatches.user1_id, other_user.id == AcceptedMatches.user2_id).one_or_none()
-
-    # Make sure random user is... not the logged in user, has favorites already set, and not a previous match
-    if other_user == g.user or other_user.favorites_id == None or other_user in g.user.matches or already_matched != None:
-        return redirect('/')
-
-    # Queries Favorites to display the random user's profile
-    other_user_favorites = Favorites.query.filter_by(user_id=other_user.id).one_or_none()
+    # Pick a random user, with favorites set and not already matched, to offer as a match
+    other_user, other_user_favorites = random_user(g.user) or (None, None)
 
     return render_template('home.html', other_user=other_user, other_user_favorites=other_user_favorites)
 
@@ -324,8 +336,9 @@ def match_users(other_user_id):
         flash("You are a match! Visit your matches page to view your new match! 😄", "success")
         accepted_match = AcceptedMatches(user1_id=user.id, user2_id=user2.id)
         db.session.add(accepted_match)
-        db.session.commit()
-    
+
+    db.session.commit()
+
     return redirect('/')
 
 ########################################################
@@ -345,7 +358,7 @@ def show_matches():
         flash("You don't have any matches yet, let's make some matches!", "success")
         return redirect('/')
 
-    return render_template('users/matches.html', matches=all_matches)
+    return conditional_response(render_template('users/matches.html', matches=all_matches))
 
 @app.route('/matches/<int:other_user_id>/delete', methods=["POST"])
 def delete_match(other_user_id):
@@ -353,16 +366,17 @@ def delete_match(other_user_id):
 
     matched_user = User.query.get_or_404(other_user_id)
 
-    potential_match = Match.query.filter(g.user.id == Match.user1_id, matched_user.id == Match.user2_id).one_or_none()
-    if not potential_match:
-        potential_match = Match.query.filter(g.user.id == Match.user2_id, matched_user.id == Match.user1_id).one_or_none()
+    # Delete the match between both users, whichever of them is user1
+    Match.query.filter(or_(
+        and_(Match.user1_id == g.user.id, Match.user2_id == matched_user.id),
+        and_(Match.user1_id == matched_user.id, Match.user2_id == g.user.id)
+    )).delete(synchronize_session=False)
 
-    accepted_match = AcceptedMatches.query.filter(g.user.id == AcceptedMatches.user1_id, matched_user.id == AcceptedMatches.user2_id).one_or_none()
-    if not accepted_match:
-        accepted_match = AcceptedMatches.query.filter(g.user.id == AcceptedMatches.user2_id, matched_user.id == AcceptedMatches.user1_id).one_or_none()
+    AcceptedMatches.query.filter(or_(
+        and_(AcceptedMatches.user1_id == g.user.id, AcceptedMatches.user2_id == matched_user.id),
+        and_(AcceptedMatches.user1_id == matched_user.id, AcceptedMatches.user2_id == g.user.id)
+    )).delete(synchronize_session=False)
 
-    db.session.delete(potential_match)
-    db.session.delete(accepted_match)
     db.session.commit()
 
     return redirect('/matches')
\ No newline at end of file
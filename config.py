@@ -9,12 +9,21 @@ class Config(object):
     SQLALCHEMY_ECHO = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DEBUG_TB_INTERCEPT_REDIRECTS = False
+    CACHE_TYPE = 'SimpleCache'
+    CACHE_DEFAULT_TIMEOUT = 3600
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql:///gamr')
     if SQLALCHEMY_DATABASE_URI.startswith("postgres://"):
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace("postgres://", "postgresql://", 1)
 
 class ProductionConfig(Config):
-    pass
+    SQLALCHEMY_RECORD_QUERIES = False
+    # One connection per gunicorn thread (see Procfile), recycled instead of pinged on checkout
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 4,
+        'max_overflow': 2,
+        'pool_recycle': 1800,
+        'pool_pre_ping': False
+    }
 
 class DevelopmentConfig(Config):
     DEBUG = True
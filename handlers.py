@@ -1,26 +1,28 @@
 from flask import flash
+from flask_caching import Cache
 from sqlalchemy.sql import func
-from sqlalchemy.orm import load_only
 import os
 import requests
-from models import User, db
+from models import AcceptedMatches, Favorites, Match, User, db
+
+cache = Cache()
 
 def handle_signup_errors(username, email, user_id):
     """Handles errors for signup or updating profile"""
-    
-    existing_username = User.query.filter_by(username=username).one_or_none()
-    existing_email = User.query.filter_by(email=email).one_or_none()
 
-    if existing_username and existing_username.id != user_id:
+    existing_users = User.query.filter(db.or_(User.username == username, User.email == email)).all()
+
+    if any(user.username == username and user.id != user_id for user in existing_users):
         flash("Username already taken, please try a different username.", 'danger')
         return True
-    if existing_email and existing_email.id != user_id:
+    if any(user.email == email and user.id != user_id for user in existing_users):
         flash("Account already exists with that email address.", 'danger')
         return True
 
     else:
         return False
     
+@cache.memoize()
 def handle_game_choices():
     """Use the IGDB API to give the user choices for their favorite video games"""
 
@@ -38,21 +40,29 @@ def handle_game_choices():
         }
     resp = requests.post('https://api.igdb.com/v4/games', headers=headers, data='fields name; where release_dates.platform = (130,48,49,6) & themes != (42); limit 500;')
 
-    resp_list = resp.json()
+    return sorted(game['name'] for game in resp.json())
 
-    games = []
+def get_user_with_favorites(user_id):
+    """Get a user and their favorites, which may be None, in one query. 404s if there's no such user."""
 
-    for d in resp_list:
-        games.append(d['name'])
-        
-    games.sort()
-    
-    return games
-
-def random_user():
-    return User.query.options(load_only('id')).offset(
-            func.floor(
-                func.random() *
-                db.session.query(func.count(User.id))
-            )
-        ).limit(1).all()
\ No newline at end of file
+    return db.session.query(User, Favorites).outerjoin(
+            Favorites, Favorites.user_id == User.id
+        ).filter(User.id == user_id).first_or_404()
+
+def random_user(user):
+    """Pick a random user, with favorites set, who the given user hasn't matched with yet.
+
+    Returns a (user, favorites) row, or None if there is no one left to match with.
+    """
+
+    already_matched = Match.query.filter(Match.user1_id == user.id, Match.user2_id == User.id).exists()
+    already_accepted = AcceptedMatches.query.filter(AcceptedMatches.user1_id == user.id, AcceptedMatches.user2_id == User.id).exists()
+
+    return db.session.query(User, Favorites).join(
+            Favorites, Favorites.user_id == User.id
+        ).filter(
+            User.id != user.id,
+            User.favorites_id != None,
+            ~already_matched,
+            ~already_accepted
+        ).order_by(func.random()).limit(1).one_or_none()
@@ -10,6 +10,10 @@ class Match(db.Model):
     Boolean if they accepted eachother."""
 
     __tablename__ = 'matches'
+    __table_args__ = (
+        db.Index('ix_matches_user1_id_user2_id', 'user1_id', 'user2_id'),
+        db.Index('ix_matches_user2_id_user1_id', 'user2_id', 'user1_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -32,6 +36,10 @@ class AcceptedMatches(db.Model):
     """All matches that have been accepted between users."""
 
     __tablename__ = 'accepted_matches'
+    # (user1_id, user2_id) is covered by the primary key
+    __table_args__ = (
+        db.Index('ix_accepted_matches_user2_id_user1_id', 'user2_id', 'user1_id'),
+    )
 
     user1_id = db.Column(
         db.Integer,
@@ -114,43 +122,46 @@ class User(db.Model):
     def all_matches(self):
         """A list of users matched with the logged in user."""
 
-        matches_as_user1 = AcceptedMatches.query.filter(AcceptedMatches.user1_id == self.id).all()
-        matches_as_user2 = AcceptedMatches.query.filter(AcceptedMatches.user2_id == self.id).all()
-
-        all_matches = []
+        return User.query.join(
+            AcceptedMatches,
+            db.or_(
+                db.and_(AcceptedMatches.user1_id == self.id, AcceptedMatches.user2_id == User.id),
+                db.and_(AcceptedMatches.user2_id == self.id, AcceptedMatches.user1_id == User.id)
+            )
+        ).all()
 
-        for match in matches_as_user1:
-            user = User.query.get_or_404(match.user2_id)
-            all_matches.append(user)
+    def all_match_ids(self):
+        """A set of the ids of users matched with the logged in user."""
 
-        for match in matches_as_user2:
-            user = User.query.get_or_404(match.user1_id)
-            all_matches.append(user)
+        as_user1 = db.session.query(AcceptedMatches.user2_id).filter(AcceptedMatches.user1_id == self.id)
+        as_user2 = db.session.query(AcceptedMatches.user1_id).filter(AcceptedMatches.user2_id == self.id)
 
-        return all_matches
+        return {match_id for (match_id,) in as_user1.union_all(as_user2)}
 
     def accepts_match(self, other_user_id):
-        """Accepts a match between 2 users and adds it to matches table."""
+        """Accepts a match between 2 users and adds it to matches table.
+
+        The match is flushed but not committed, the caller commits.
+        """
+
+        match = Match.query.filter(db.or_(
+            db.and_(Match.user1_id == self.id, Match.user2_id == other_user_id),
+            db.and_(Match.user1_id == other_user_id, Match.user2_id == self.id)
+        )).first()
 
-        match = Match.query.filter(self.id == Match.user1_id, other_user_id == Match.user2_id).one_or_none()
-        
-        if match == None:
-            match = Match.query.filter(self.id == Match.user2_id, other_user_id == Match.user1_id).one_or_none()
-        
         if not match:
             match = Match(
                 user1_id=self.id,
                 user2_id=other_user_id
             )
             db.session.add(match)
-            db.session.commit()
 
         if match.user1_id == self.id:
             match.user1_accepted = True
-            db.session.commit()
         else:
             match.user2_accepted = True
-            db.session.commit()
+
+        db.session.flush()
 
         return match
 
@@ -2,7 +2,8 @@ from unittest import TestCase
 
 from flask.helpers import get_flashed_messages
 from models import db, User, Favorites, Match
-from handlers import handle_signup_errors
+from werkzeug.exceptions import NotFound
+from handlers import get_user_with_favorites, handle_signup_errors, random_user
 from app import app
 
 class UserViewsTestCase(TestCase):
@@ -51,3 +52,38 @@ class UserViewsTestCase(TestCase):
 
             self.assertTrue(test2)
             self.assertEqual(get_flashed_messages()[0], "Account already exists with that email address.")
+
+    def test_get_user_with_favorites(self):
+        """Does get_user_with_favorites return the user with their favorites, or None
+            if they haven't set any? Does it 404 for a missing user?"""
+
+        f2 = Favorites(role='DPS', system='Playstation', game1='Fallout', user_id=self.uid2)
+        db.session.add(f2)
+        db.session.commit()
+
+        self.assertEqual(tuple(get_user_with_favorites(self.uid2)), (self.u2, f2))
+        self.assertEqual(tuple(get_user_with_favorites(self.uid1)), (self.u1, None))
+
+        with self.assertRaises(NotFound):
+            get_user_with_favorites(999)
+
+    def test_random_user(self):
+        """Does random_user only pick another user who has favorites set
+            and hasn't been matched with yet?"""
+
+        f2 = Favorites(role='DPS', system='Playstation', game1='Fallout', user_id=self.uid2)
+        db.session.add(f2)
+        db.session.commit()
+        self.u2.favorites_id = f2.id
+        db.session.commit()
+
+        other_user, other_user_favorites = random_user(self.u1)
+        self.assertEqual(other_user, self.u2)
+        self.assertEqual(other_user_favorites, f2)
+
+        # testuser1 has no favorites so there's no one for testuser2 to match with
+        self.assertIsNone(random_user(self.u2))
+
+        # testuser2 is no longer offered once testuser1 accepts the match
+        self.u1.accepts_match(self.uid2)
+        self.assertIsNone(random_user(self.u1))
@@ -130,4 +130,8 @@ class MatchesViewsTestCase(TestCase):
 
             resp = c.post('/matches/3/delete')
 
-            self.assertEqual(resp.status_code, 302)
\ No newline at end of file
+            self.assertEqual(resp.status_code, 302)
+            self.assertIsNone(Match.query.filter(Match.user1_id == 3, Match.user2_id == 2).one_or_none())
+            self.assertIsNone(AcceptedMatches.query.filter(AcceptedMatches.user1_id == 2, AcceptedMatches.user2_id == 3).one_or_none())
+            # testuser2's match with testuser4 is left alone
+            self.assertIsNotNone(AcceptedMatches.query.filter(AcceptedMatches.user1_id == 2, AcceptedMatches.user2_id == 4).one_or_none())
\ No newline at end of file
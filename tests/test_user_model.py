@@ -1,7 +1,7 @@
 """User model tests."""
 
 from unittest import TestCase
-from models import db, User, Favorites, Match
+from models import db, User, Favorites, Match, AcceptedMatches
 from app import app
 
 
@@ -19,6 +19,7 @@ class UserModelTestCase(TestCase):
         User.query.delete()
         Favorites.query.delete()
         Match.query.delete()
+        AcceptedMatches.query.delete()
 
         u1 = User.signup('testuser1', 'test1@test.com', 'HASHED_PASSWORD1', 'Test1firstname', 'Test1lastname', None)
         uid1 = 1
@@ -70,6 +71,15 @@ class UserModelTestCase(TestCase):
         self.assertTrue(len(matches) == 0)
         self.assertEqual(len(self.u1.matches), 1)
 
+    def test_all_match_ids(self):
+        """Does user.all_match_ids return a set of the ids of matched users from either side of the match?"""
+
+        db.session.add(AcceptedMatches(user1_id=self.uid1, user2_id=self.uid2))
+        db.session.commit()
+
+        self.assertEqual(self.u1.all_match_ids(), {self.uid2})
+        self.assertEqual(self.u2.all_match_ids(), {self.uid1})
+
     def test_user_accepts_match(self):
         """Does the user.accepts_match add the other user to user.matches?
         Does the user.accepts_match set the users choice to True?"""
@@ -148,6 +148,11 @@ class UserViewsTestCase(TestCase):
             self.assertEqual(resp.status_code, 200)
             self.assertIn('<h2 class="card-title">testuser2</h2>', html)
 
+            # Check that an unchanged profile isn't sent again
+            resp = c.get(f'/users/{self.uid2}', headers={"If-None-Match": resp.headers["ETag"]})
+
+            self.assertEqual(resp.status_code, 304)
+
     def test_show_edit_form(self):
         """Can a non logged in user see the page? Does the view properly display the EditUserForm when user is logged in?"""
         